@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+import functools
 import math
 import os
 
@@ -14,6 +15,14 @@ LEAGUE_AVG_RTG = 103.0
 MIN_POSSESSIONS = 65
 STD_TOTAL = 11.0
 
+# Team stats only change when the GitHub Action rewrites DATA_FILE. The
+# cache is keyed on the file's mtime, which is read on every projection, so
+# the TTL is only a safety net. Only the current table is kept.
+TEAM_CACHE_TTL = 24 * 3600
+
+# Scales (proj - line) straight to the erfc argument: 1 / (STD_TOTAL * sqrt(2))
+Z_SCALE = 1.0 / (STD_TOTAL * math.sqrt(2.0))
+
 # =========================
 # NORMALIZATION
 # =========================
@@ -24,35 +33,54 @@ ALIASES = {
     "st johns": "saint johns",
 }
 
+# Applied in order by both normalize and normalize_column, so typed names
+# and the team table keys always go through the same rewrite.
+REPLACEMENTS = ((".", ""), ("&", "and"), ("'", ""))
+
+@functools.lru_cache(maxsize=1024)
 def normalize(name):
-    name = (
-        str(name)
-        .lower()
-        .replace(".", "")
-        .replace("&", "and")
-        .replace("'", "")
-        .strip()
-    )
+    name = str(name).lower()
+    for old, new in REPLACEMENTS:
+        name = name.replace(old, new)
+    name = name.strip()
     return ALIASES.get(name, name)
 
+def normalize_column(names):
+    # Vectorized normalize() for a whole Series of team names.
+    names = names.astype(str).str.lower()
+    for old, new in REPLACEMENTS:
+        names = names.str.replace(old, new, regex=False)
+    return names.str.strip().replace(ALIASES)
+
 # =========================
 # LOAD TEAM DATA
 # =========================
 
-@st.cache_data(ttl=3600)
-def load_teams():
-    if not os.path.exists(DATA_FILE):
-        st.error("Public data file missing. GitHub Action has not run yet.")
-        st.stop()
-
-    df = pd.read_csv(DATA_FILE)
+@st.cache_resource(ttl=TEAM_CACHE_TTL, max_entries=1)
+def load_teams(mtime):
+    # mtime is unused in the body. It keys the cache, so the first projection
+    # after DATA_FILE is rewritten loads the new table.
+    df = pd.read_csv(
+        DATA_FILE,
+        usecols=["Team", "Tempo", "AdjOE", "AdjDE"],
+        dtype={"Team": str, "Tempo": float, "AdjOE": float, "AdjDE": float},
+    )
+    df = df.dropna(subset=["Team"])
 
     teams = {}
-    for _, r in df.iterrows():
-        teams[normalize(r["Team"])] = {
-            "tempo": float(r["Tempo"]),
-            "off": float(r["AdjOE"]),
-            "def": float(r["AdjDE"]),
+    for key, tempo, off, deff in zip(
+        normalize_column(df["Team"]), df["Tempo"], df["AdjOE"], df["AdjDE"]
+    ):
+        # A zero (placeholder) or negative AdjDE can't be turned into a
+        # factor; leave the team out so only its matchups report not found.
+        if deff <= 0:
+            continue
+        # Ratings are stored as factors relative to the league average so
+        # projected_total only has to multiply them together.
+        teams[key] = {
+            "tempo": float(tempo),
+            "off_factor": float(off) / LEAGUE_AVG_RTG,
+            "def_factor": LEAGUE_AVG_RTG / float(deff),
         }
 
     return teams
@@ -67,14 +95,13 @@ def projected_total(home, away, T):
 
     possessions = max((h["tempo"] + a["tempo"]) / 2, MIN_POSSESSIONS)
 
-    home_ppp = (h["off"] / LEAGUE_AVG_RTG) * (LEAGUE_AVG_RTG / a["def"])
-    away_ppp = (a["off"] / LEAGUE_AVG_RTG) * (LEAGUE_AVG_RTG / h["def"])
+    home_ppp = h["off_factor"] * a["def_factor"]
+    away_ppp = a["off_factor"] * h["def_factor"]
 
     return round(possessions * (home_ppp + away_ppp), 1)
 
 def prob_over(proj, line):
-    z = (proj - line) / STD_TOTAL
-    return 0.5 * (1 + math.erf(z / math.sqrt(2)))
+    return 0.5 * math.erfc((line - proj) * Z_SCALE)
 
 # =========================
 # UI
@@ -82,22 +109,40 @@ def prob_over(proj, line):
 
 st.title("🏀 NCAAB Predictive Totals Model (Public Data)")
 
-TEAM = load_teams()
-
-home = st.text_input("Home Team")
-away = st.text_input("Away Team")
-line = st.number_input("Market Total", value=140.5)
-
-if st.button("Project Total"):
-    h = normalize(home)
-    a = normalize(away)
-
-    if h not in TEAM or a not in TEAM:
-        st.error("Team not found in public dataset")
-    else:
-        proj = projected_total(h, a, TEAM)
-        prob = prob_over(proj, line)
-
-        st.metric("Projected Total", proj)
-        st.metric("Edge", round(proj - line, 1))
-        st.metric("Over Probability", f"{prob*100:.1f}%")
+if not os.path.exists(DATA_FILE):
+    st.error("Public data file missing. GitHub Action has not run yet.")
+    st.stop()
+
+# The inputs sit in a form so typing doesn't rerun anything; submitting
+# reruns only this fragment, not the whole script.
+@st.fragment
+def matchup():
+    with st.form("matchup"):
+        home = st.text_input("Home Team")
+        away = st.text_input("Away Team")
+        line = st.number_input("Market Total", value=140.5)
+        submitted = st.form_submit_button("Project Total")
+
+    if submitted:
+        # Loaded here rather than at module scope: fragment reruns skip
+        # module-level code, so this is where a rewritten DATA_FILE is seen.
+        # They also skip the exists() check above, hence the OSError guard.
+        try:
+            teams = load_teams(os.path.getmtime(DATA_FILE))
+        except OSError:
+            st.error("Public data file missing. GitHub Action has not run yet.")
+            return
+        h = normalize(home)
+        a = normalize(away)
+
+        if h not in teams or a not in teams:
+            st.error("Team not found in public dataset")
+        else:
+            proj = projected_total(h, a, teams)
+            prob = prob_over(proj, line)
+
+            st.metric("Projected Total", proj)
+            st.metric("Edge", round(proj - line, 1))
+            st.metric("Over Probability", f"{prob*100:.1f}%")
+
+matchup()